@@ -72,6 +72,8 @@ CLI.add_argument(
     help="path to directory with daily input",
 )
 
-opts = CLI.parse_args()
-for d in opts.DAY:
-    run_solution(d, opts.example, opts.data)
+# worker processes of parallel solutions may import this module again
+if __name__ == "__main__":
+    opts = CLI.parse_args()
+    for d in opts.DAY:
+        run_solution(d, opts.example, opts.data)
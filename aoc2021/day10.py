@@ -1,19 +1,10 @@
-from typing import Iterator
+from typing import Iterator, Iterable
 from io import StringIO
+import random
 
 
 def solve(in_stream: StringIO) -> tuple[object, object]:
-    instructions = [line.strip() for line in in_stream]
-    # ): 3 points.
-    # ]: 57 points.
-    # }: 1197 points.
-    # >: 25137 points.
-    corrupted_cost = {")": 3, "]": 57, "}": 1197, ">": 25137}
-    missing_scores = sorted(map(score_missing, find_missing(instructions)))
-    return (
-        sum(map(corrupted_cost.get, find_corrupted(instructions))),
-        missing_scores[len(missing_scores) // 2],
-    )
+    return scan_navigation(line.strip() for line in in_stream)
 
 
 # Symbol pairs are always *nested*: We can have ( [] {} ) but not ( [} {] )
@@ -64,3 +55,71 @@ def score_missing(stack: list[str]) -> int:
         total *= 5
         total += missing_cost[symbol]
     return total
+
+
+# Single pass streaming scanner
+# =============================
+# Both parts need the same stack walk over each line – the corrupted lines stop
+# early at the first bad closing symbol, the incomplete lines reach their end with
+# a non-empty stack. Instead of walking each line twice and collecting all lines
+# first, we can classify every line on the fly and only keep the scores.
+# - The stack only ever holds the current line, so memory is O(longest line).
+# - Opening symbols are translated to their *closing* symbol when pushed. A closing
+#   symbol then matches iff it is equal to the top of the stack; there is no need to
+#   build and look up the pair of symbols.
+# - All symbol properties come from precomputed tables: each symbol either has a
+#   closer (it is opening) or a corruption cost (it is closing).
+CLOSER = {"(": ")", "[": "]", "{": "}", "<": ">"}
+CORRUPTED_COST = {")": 3, "]": 57, "}": 1197, ">": 25137}
+# the score of a missing symbol is indexed by its *closer*, as that is on the stack
+MISSING_COST = {")": 1, "]": 2, "}": 3, ">": 4}
+
+
+def scan_navigation(instructions: Iterable[str]) -> tuple[int, int]:
+    """Score corrupted and incomplete instructions in a single pass"""
+    corrupted_total = 0
+    missing_scores = []
+    closer = CLOSER
+    for line in instructions:
+        stack = []
+        push, pop = stack.append, stack.pop
+        for symbol in line:
+            closing = closer.get(symbol)
+            if closing is not None:
+                push(closing)
+            # a closing symbol on an empty stack is corrupt as well
+            elif not stack or pop() != symbol:
+                corrupted_total += CORRUPTED_COST[symbol]
+                break
+        else:
+            # empty stacks are valid lines; they are neither corrupt nor incomplete
+            if stack:
+                total = 0
+                for symbol in reversed(stack):
+                    total = total * 5 + MISSING_COST[symbol]
+                missing_scores.append(total)
+    median = (
+        quickselect(missing_scores, len(missing_scores) // 2) if missing_scores else 0
+    )
+    return corrupted_total, median
+
+
+# Quickselect is "quicksort, but only for one side"
+# =================================================
+# Sorting all scores just to pick the middle one does more work than needed.
+# Quickselect partitions the values around a pivot and then continues only with the
+# partition containing the k-th value, which takes O(n) time on average.
+# Picking the pivot at random avoids the worst case for already sorted input.
+def quickselect(values: list[int], k: int) -> int:
+    """Find the `k`-th smallest item of `values`"""
+    while True:
+        pivot = random.choice(values)
+        lower = [value for value in values if value < pivot]
+        if k < len(lower):
+            values = lower
+            continue
+        equal = sum(value == pivot for value in values)
+        if k < len(lower) + equal:
+            return pivot
+        k -= len(lower) + equal
+        values = [value for value in values if value > pivot]
@@ -1,17 +1,17 @@
 from typing import Iterable, Any
 from io import StringIO
+import functools
 
 
 ADJACENCY_MAP = dict[str, frozenset[str]]
 PATH = tuple[str, ...]
 SEEN = frozenset[str, ...]
+WEIGHTED_MAP = dict[str, dict[str, int]]
 
 
 def solve(in_stream: StringIO) -> tuple[object, object]:
-    adjacency = read(in_stream)
-    return count(find_unique_paths(adjacency, ("start",), frozenset())), count(
-        find_single_paths(adjacency, ("start",), frozenset())
-    )
+    weighted = contract(read(in_stream))
+    return count_paths(weighted), count_paths(weighted, revisit=True)
 
 
 def read(in_stream: StringIO) -> ADJACENCY_MAP:
@@ -24,6 +24,31 @@ def read(in_stream: StringIO) -> ADJACENCY_MAP:
     return {parent: frozenset(adjacent) for parent, adjacent in adjacency.items()}
 
 
+# Big cave contraction
+# ====================
+# Big caves may be visited any number of times, so they never constrain a path.
+# Their only effect is to connect the small caves around them: a path going
+# small -> big -> small could just as well go small -> small directly. We can thus
+# remove all big caves and instead connect their small neighbours, including each
+# small cave to itself. Since there may be several ways between two small caves, the
+# new connections are *weighted* by how many ways they represent.
+# This requires that big caves are never adjacent – otherwise, there would be
+# infinitely many paths going back and forth between them.
+def contract(caves: ADJACENCY_MAP) -> WEIGHTED_MAP:
+    """Replace big caves by weighted connections between their small neighbours"""
+    weighted = {cave: {} for cave in caves if cave.islower()}
+    for cave, connections in weighted.items():
+        for adjacent in caves[cave]:
+            if adjacent.islower():
+                connections[adjacent] = connections.get(adjacent, 0) + 1
+                continue
+            for via in caves[adjacent]:
+                if not via.islower():
+                    raise ValueError(f"adjacent big caves {adjacent} and {via}")
+                connections[via] = connections.get(via, 0) + 1
+    return weighted
+
+
 def count(obj: Iterable[Any]) -> int:
     """Provide the length of an iterator destructively"""
     return sum(1 for _ in obj)
@@ -67,3 +92,38 @@ def find_single_paths(
             else:
                 # not re-visiting a cave is the part 1 task
                 yield from find_unique_paths(caves, path + (child,), seen_small)
+
+
+# Memoised path counting
+# ======================
+# Enumerating paths costs time for every single path – but we only need their count.
+# The number of ways to reach the "end" from a cave only depends on
+# - the current cave,
+# - which small caves have been visited already, and
+# - whether the one small cave revisit has been used up already.
+# This is much less than the number of paths, since many paths lead to the same
+# state. By caching the count per state, each state is computed only once.
+# To make the state cheap to store and compare, the set of visited small caves is
+# represented as an integer bit mask – each small cave is assigned its own bit.
+# Paths are counted on the contracted graph, where every cave is small. Each step
+# along a connection counts for as many paths as the connection's weight.
+def count_paths(caves: WEIGHTED_MAP, revisit: bool = False) -> int:
+    """Count the paths with unique visits to any small cave but `revisit` of one"""
+    bits = {cave: 1 << index for index, cave in enumerate(sorted(caves))}
+
+    @functools.lru_cache(maxsize=None)
+    def paths_from(current: str, visited: int, twice_used: bool) -> int:
+        if current == "end":
+            return 1
+        total = 0
+        for child, weight in caves[current].items():
+            if child == "start":
+                continue
+            bit = bits[child]
+            if not visited & bit:
+                total += weight * paths_from(child, visited | bit, twice_used)
+            elif not twice_used:
+                total += weight * paths_from(child, visited, True)
+        return total
+
+    return paths_from("start", bits["start"], not revisit)
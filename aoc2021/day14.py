@@ -1,6 +1,7 @@
 from typing import Iterable
 from io import StringIO
 from collections import Counter
+from operator import mul
 
 
 RULES = dict[str, str]
@@ -17,9 +18,8 @@ def read_instructions(in_stream: StringIO) -> tuple[str, RULES]:
 
 def solve(in_stream: StringIO) -> tuple[object, object]:
     template, rules = read_instructions(in_stream)
-    # we could speed up the second expansion by using the memo of the first
-    # that is only about 10% extra performance, though
-    return expand_quantity(template, 10, rules), expand_quantity(template, 40, rules)
+    # both step counts share the same transition powers
+    return tuple(PairTransitions(template, rules).quantities([10, 40]))
 
 
 def expand_quantity(template: str, steps: int, rules: RULES) -> int:
@@ -52,3 +52,201 @@ def pairwise(itr: Iterable[str]) -> Iterable[str]:
     for current in iterator:
         yield prev + current
         prev = current
+
+
+MATRIX = list[list[int]]
+
+
+def pair_alphabet(template: str, rules: RULES) -> list[str]:
+    """All pairs that may ever occur when expanding ``template``"""
+    # the template's pairs and whatever they may turn into
+    pairs, unvisited = set(), {*pairwise(template), *rules}
+    while unvisited:
+        pair = unvisited.pop()
+        pairs.add(pair)
+        unvisited.update(set(pairwise(rules.get(pair, pair))) - pairs)
+    return sorted(pairs)
+
+
+# Pair count transitions
+# ======================
+# What happens to each pair during one step does not depend on its position – it
+# is replaced by the same two new pairs each time. So the polymer can be described
+# just by how often each pair occurs, a vector of counts over all possible pairs.
+# One step is a linear map from pair counts to pair counts, i.e. a matrix
+# where each column `source` has a 1 for each of the pairs `source` turns into.
+# Doing `n` steps means applying the matrix `n` times – or applying the matrix to the
+# power of `n` once. Powers can be built by repeated squaring, M^2 = M * M,
+# M^4 = M^2 * M^2 and so on, so any `n` only needs the log2(n) powers M^(2^k).
+# These powers are the expensive part and independent of `n`, so we keep them for
+# all queries. Each query then only multiplies the count vector by some powers.
+class PairTransitions:
+    """Polymer expansion as repeated transitions of pair counts"""
+
+    def __init__(self, template: str, rules: RULES):
+        self.template = template
+        self.pairs = pair_alphabet(template, rules)
+        self.index = {pair: index for index, pair in enumerate(self.pairs)}
+        transition = [[0] * len(self.pairs) for _ in self.pairs]
+        for source, pair in enumerate(self.pairs):
+            for target in pairwise(rules.get(pair, pair)):
+                transition[self.index[target]][source] += 1
+        # transition matrices for 1, 2, 4, 8, ... steps
+        self.powers: list[MATRIX] = [transition]
+        self.initial = [0] * len(self.pairs)
+        for pair in pairwise(template):
+            self.initial[self.index[pair]] += 1
+
+    def _power(self, exponent: int) -> MATRIX:
+        """Get the transition matrix for ``2 ** exponent`` steps"""
+        while len(self.powers) <= exponent:
+            square = self.powers[-1]
+            columns = list(zip(*square))
+            self.powers.append(
+                [[sum(map(mul, row, column)) for column in columns] for row in square]
+            )
+        return self.powers[exponent]
+
+    def pair_counts(self, steps: int) -> dict[str, int]:
+        """Count the pairs after expanding ``steps`` times"""
+        counts, exponent = self.initial, 0
+        while steps:
+            if steps & 1:
+                counts = [sum(map(mul, row, counts)) for row in self._power(exponent)]
+            steps >>= 1
+            exponent += 1
+        return dict(zip(self.pairs, counts))
+
+    def element_counts(self, steps: int) -> Counter:
+        """Count the elements after expanding ``steps`` times"""
+        # every element is the first of a pair – except for the very last element
+        elements = Counter(self.template[-1])
+        for pair, count in self.pair_counts(steps).items():
+            elements[pair[0]] += count
+        return elements
+
+    def quantities(self, steps: Iterable[int]) -> list[int]:
+        """Compute the quantity of extremes after each of ``steps``"""
+        results = []
+        for step in steps:
+            counts = [count for count in self.element_counts(step).values() if count]
+            results.append(max(counts) - min(counts))
+        return results
+
+
+# Random access to the expanded polymer
+# =====================================
+# The expanded polymer is an implicit binary tree: after `n` steps, each pair of the
+# template has turned into the expansion of its two child pairs after `n - 1` steps.
+# To avoid counting the shared element of neighbouring pairs twice, each pair only
+# stands for its *first* element and everything inserted after it. The very last
+# element of the polymer is thus never part of any pair and handled separately.
+# If we know the length and element counts of each (pair, steps) subtree, we can
+# find any position by walking down the tree: going left if the position is within
+# the left child's length, and going right with the remaining position otherwise.
+# Since there are only so many pairs, the subtree sizes can be precomputed per
+# level of steps. A query then only needs one descent of `n` levels.
+class PolymerIndex:
+    """Queries on the expanded polymer without building it"""
+
+    def __init__(self, template: str, rules: RULES):
+        self.template = template
+        self.pairs = pair_alphabet(template, rules)
+        self._children = {
+            pair: tuple(pairwise(rules[pair])) for pair in self.pairs if pair in rules
+        }
+        # the (length, element counts) of each pair subtree, by steps
+        self._levels: list[dict[str, tuple[int, Counter]]] = [
+            {pair: (1, Counter(pair[0])) for pair in self.pairs}
+        ]
+
+    def _level(self, steps: int) -> dict[str, tuple[int, Counter]]:
+        while len(self._levels) <= steps:
+            below, level = self._levels[-1], {}
+            for pair in self.pairs:
+                try:
+                    left, right = self._children[pair]
+                except KeyError:
+                    level[pair] = below[pair]
+                else:
+                    (left_length, left_counts), (right_length, right_counts) = (
+                        below[left],
+                        below[right],
+                    )
+                    level[pair] = left_length + right_length, left_counts + right_counts
+            self._levels.append(level)
+        return self._levels[steps]
+
+    def length(self, steps: int) -> int:
+        """Length of the polymer after expanding ``steps`` times"""
+        level = self._level(steps)
+        return sum(level[pair][0] for pair in pairwise(self.template)) + 1
+
+    def element_at(self, position: int, steps: int) -> str:
+        """Element at ``position`` after expanding ``steps`` times"""
+        length = self.length(steps)
+        # negative positions count from the end, as for sequences
+        if position < 0:
+            position += length
+        if not 0 <= position < length:
+            raise IndexError("polymer index out of range")
+        level = self._level(steps)
+        for pair in pairwise(self.template):
+            if position < level[pair][0]:
+                break
+            position -= level[pair][0]
+        else:
+            return self.template[-1]
+        for depth in range(steps - 1, -1, -1):
+            try:
+                left, right = self._children[pair]
+            except KeyError:
+                break
+            left_length = self._levels[depth][left][0]
+            if position < left_length:
+                pair = left
+            else:
+                position -= left_length
+                pair = right
+        return pair[0]
+
+    def count_range(self, start: int, stop: int, steps: int) -> Counter:
+        """Count the elements in positions ``start`` to ``stop`` after ``steps``"""
+        length = self.length(steps)
+        start, stop = (
+            bound + length if bound < 0 else bound for bound in (start, stop)
+        )
+        if not 0 <= start <= stop <= length:
+            raise IndexError("polymer range out of range")
+        return self._count_prefix(stop, steps) - self._count_prefix(start, steps)
+
+    def _count_prefix(self, stop: int, steps: int) -> Counter:
+        """Count the elements before position ``stop`` after ``steps``"""
+        level = self._level(steps)
+        counts = Counter()
+        for pair in pairwise(self.template):
+            length, pair_counts = level[pair]
+            if stop < length:
+                break
+            counts.update(pair_counts)
+            stop -= length
+        else:
+            if stop > 0:
+                counts[self.template[-1]] += 1
+            return counts
+        for depth in range(steps - 1, -1, -1):
+            try:
+                left, right = self._children[pair]
+            except KeyError:
+                break
+            left_length, left_counts = self._levels[depth][left]
+            if stop < left_length:
+                pair = left
+            else:
+                counts.update(left_counts)
+                stop -= left_length
+                pair = right
+        # we are left with a single element, which is either before or at `stop`
+        if stop > 0:
+            counts[pair[0]] += 1
+        return counts
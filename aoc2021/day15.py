@@ -1,12 +1,15 @@
-from typing import Iterable
+from typing import Iterable, Optional, Union
 from io import StringIO
+from array import array
 import heapq
+import functools
 
 
 def solve(in_stream: StringIO) -> tuple[object, object]:
-    risk_map = [[int(field) for field in line.strip()] for line in in_stream]
-    expanded_map = expand(risk_map, 5)
-    return dijkstra(risk_map), dijkstra(expanded_map)
+    risk_map = FlatRiskMap(
+        [[int(field) for field in line.strip()] for line in in_stream]
+    )
+    return lowest_risk(risk_map), lowest_risk(TiledRiskMap(risk_map, 5))
 
 
 def expand(risk_map: list[list[int]], repeat: int) -> list[list[int]]:
@@ -54,3 +57,187 @@ def neighbours(
         yield row, column - 1
     if column != max_column:
         yield row, column + 1
+
+
+# Dial's algorithm
+# ================
+# Dijkstra's algorithm needs a priority queue to always pick the cheapest position
+# next. A generic binary heap costs O(log n) per operation – but our costs are special:
+# each step adds a risk of 1 to 9. When the cheapest pending position costs `c`, all
+# other pending positions cost between `c` and `c + 9`.
+# So instead of a heap, we use one "bucket" per cost – and only need 10 of them,
+# reusing the bucket of cost `c` for cost `c + 10` once we are done with it.
+# Picking the next position is just taking one from the current bucket, and a
+# position's bucket is its cost modulo 10. Both are O(1), so the search is O(cells).
+# When a position gets cheaper, we do not remove it from its old bucket but just add
+# it again. Outdated entries are recognised by their cost not matching the bucket.
+#
+# Positions are flat indices `row * width + column` into the map. This avoids tuples
+# and lets us store the costs in a compact `array` instead of a dict.
+UNREACHED = 2 ** (8 * array("l").itemsize - 1) - 1
+
+
+class FlatRiskMap:
+    """Risk map stored as a flat array of rows"""
+
+    def __init__(self, risk_map: list[list[int]]):
+        self.height, self.width = len(risk_map), len(risk_map[0])
+        self.risks = bytearray(risk for line in risk_map for risk in line)
+
+    def __len__(self):
+        return len(self.risks)
+
+    def __getitem__(self, index: int) -> int:
+        return self.risks[index]
+
+    @property
+    def min_risk(self) -> int:
+        return min(self.risks)
+
+
+# Virtual tiling
+# ==============
+# The expanded map is fully defined by the base map and the tile of each position.
+# Instead of building the expanded map, we can compute each risk whenever it is
+# looked up – the search visits each position only a few times anyway.
+# This works for any number of repetitions without using more memory for the map.
+class TiledRiskMap:
+    """View of a risk map repeated ``repeat`` times, increasing risk for each tile"""
+
+    def __init__(self, base: FlatRiskMap, repeat: int):
+        self.base, self.repeat = base, repeat
+        self.height, self.width = base.height * repeat, base.width * repeat
+
+    def __len__(self):
+        return self.height * self.width
+
+    def __getitem__(self, index: int) -> int:
+        base = self.base
+        row, column = divmod(index, self.width)
+        tile_y, base_row = divmod(row, base.height)
+        tile_x, base_column = divmod(column, base.width)
+        field = base.risks[base_row * base.width + base_column]
+        return (field + tile_x + tile_y - 1) % 9 + 1
+
+    @property
+    def min_risk(self) -> int:
+        # tiles only shift the risk, so we only need to check each shift once
+        return min(
+            (field + shift - 1) % 9 + 1
+            for field in set(self.base.risks)
+            for shift in range(2 * self.repeat - 1)
+        )
+
+
+RiskMap = Union[FlatRiskMap, TiledRiskMap]
+
+
+def dial(risk_map: RiskMap, source: int = 0, target: Optional[int] = None):
+    """Compute the lowest total risk from ``source`` to all positions or ``target``"""
+    width, size = risk_map.width, len(risk_map)
+    costs = array("l", [UNREACHED]) * size
+    costs[source] = 0
+    buckets: list[list[int]] = [[] for _ in range(10)]
+    buckets[0].append(source)
+    pending, cost = 1, 0
+    while pending:
+        bucket = buckets[cost % 10]
+        while bucket:
+            index = bucket.pop()
+            pending -= 1
+            if costs[index] != cost:
+                continue
+            if index == target:
+                return costs
+            column = index % width
+            for neighbour in (
+                index - width if index >= width else -1,
+                index + width if index + width < size else -1,
+                index - 1 if column != 0 else -1,
+                index + 1 if column != width - 1 else -1,
+            ):
+                if neighbour == -1:
+                    continue
+                new_cost = cost + risk_map[neighbour]
+                if new_cost < costs[neighbour]:
+                    costs[neighbour] = new_cost
+                    buckets[new_cost % 10].append(neighbour)
+                    pending += 1
+        cost += 1
+    return costs
+
+
+def lowest_risk(risk_map: RiskMap) -> int:
+    """Compute the lowest total risk from the top left to the bottom right"""
+    target = len(risk_map) - 1
+    return dial(risk_map, 0, target)[target]
+
+
+POSITION = tuple[int, int]
+
+
+# Repeated queries
+# ================
+# A single run of `dial` without a target computes the costs from its source to all
+# positions at once. For many queries from the same source, we keep this cost field
+# around so that each query is just one lookup. Since each field is as large as the
+# map, the number of kept fields can be bounded; the least recently used is dropped.
+#
+# For a one-off query, computing the entire field is wasteful. The A* algorithm is
+# like Dijkstra's but prefers positions that are closer to the target: each position
+# is ranked by its cost *plus* a lower bound for the remaining cost. Every step
+# towards the target costs at least the lowest risk on the map, so the distance
+# times the lowest risk is such a lower bound.
+class RiskQueries:
+    """Lowest total risk queries between arbitrary positions of a risk map"""
+
+    def __init__(self, risk_map: RiskMap, maxsize: Optional[int] = None):
+        self.risk_map = risk_map
+        self.cost_field = functools.lru_cache(maxsize=maxsize)(self._cost_field)
+
+    def _cost_field(self, source: POSITION):
+        """Compute the lowest total risk from ``source`` to all positions"""
+        return dial(self.risk_map, self._index(source))
+
+    def _index(self, position: POSITION) -> int:
+        row, column = position
+        if not (0 <= row < self.risk_map.height and 0 <= column < self.risk_map.width):
+            raise IndexError(f"position {position} is outside of the map")
+        return row * self.risk_map.width + column
+
+    def cost(self, source: POSITION, target: POSITION) -> int:
+        """Lowest total risk from ``source`` to ``target`` via the cost field"""
+        return self.cost_field(source)[self._index(target)]
+
+    def cost_once(self, source: POSITION, target: POSITION) -> int:
+        """Lowest total risk from ``source`` to ``target`` searching only towards it"""
+        risk_map = self.risk_map
+        width, size, min_risk = risk_map.width, len(risk_map), risk_map.min_risk
+        start, end = self._index(source), self._index(target)
+        target_row, target_column = target
+        costs = {start: 0}
+        order = [(0, 0, start)]
+        while order:
+            _, cost, index = heapq.heappop(order)
+            if index == end:
+                return cost
+            if costs[index] != cost:
+                continue
+            row, column = divmod(index, width)
+            for neighbour in (
+                index - width if row != 0 else -1,
+                index + width if index + width < size else -1,
+                index - 1 if column != 0 else -1,
+                index + 1 if column != width - 1 else -1,
+            ):
+                if neighbour == -1:
+                    continue
+                new_cost = cost + risk_map[neighbour]
+                if new_cost < costs.get(neighbour, UNREACHED):
+                    costs[neighbour] = new_cost
+                    nb_row, nb_column = divmod(neighbour, width)
+                    estimate = new_cost + min_risk * (
+                        abs(target_row - nb_row) + abs(target_column - nb_column)
+                    )
+                    heapq.heappush(order, (estimate, new_cost, neighbour))
+        raise ValueError(f"no path from {source} to {target}")
@@ -1,4 +1,4 @@
-from typing import NamedTuple, Any, Union
+from typing import NamedTuple, Any, Union, Optional, TextIO
 from io import StringIO
 import math
 import operator
@@ -80,9 +80,7 @@ def parse_packet(message: list[int]) -> PACKET:
 
 
 def solve(in_stream: StringIO) -> tuple[object, object]:
-    binary_message = to_binary(in_stream.readline().strip())
-    root = parse_packet(binary_message)
-    return sum_versions(root), evaluate(root)
+    return stream_evaluate(in_stream)
 
 
 def to_binary(hex_message: str) -> list[int]:
@@ -90,6 +88,54 @@ def to_binary(hex_message: str) -> list[int]:
     return [int(bit) for hexdigit in hex_message for bit in f"{int(hexdigit, 16):04b}"]
 
 
+# Decoding with a bit cursor
+# ==========================
+# Turning the message into a list of bits and slicing off each sub-packet copies
+# (most of) the message for every packet. Instead, we keep the message as compact
+# bytes and only track the *offset* of the current bit – the "cursor".
+# Reading a field of `count` bits at `offset` takes just the bytes covering these bits,
+# converts them to an integer, shifts off the bits behind the field and masks away
+# the bits before the field.
+def from_hex(hex_message: str) -> bytes:
+    """Convert a message from hex digits to bytes"""
+    # two hex digits per byte – pad an odd message with trailing zero bits
+    return bytes.fromhex(hex_message + "0" * (len(hex_message) % 2))
+
+
+def read_bits(message: bytes, offset: int, count: int) -> int:
+    """Read ``count`` bits starting at bit ``offset`` as an integer"""
+    start, stop = offset >> 3, (offset + count + 7) >> 3
+    chunk = int.from_bytes(message[start:stop], "big")
+    return (chunk >> (stop * 8 - offset - count)) & ((1 << count) - 1)
+
+
+def decode_packet(message: bytes, offset: int = 0) -> PACKET:
+    """Decode a packet starting at bit ``offset`` of a message"""
+    version, type_id = read_bits(message, offset, 3), read_bits(message, offset + 3, 3)
+    if type_id == 4:
+        cursor, value = offset + 6, 0
+        while True:
+            group = read_bits(message, cursor, 5)
+            cursor += 5
+            value = (value << 4) | (group & 0b1111)
+            if not group & 0b10000:
+                return Value(version, type_id, value, cursor - offset)
+    payloads = []
+    if read_bits(message, offset + 6, 1) == 0:
+        n_bits = read_bits(message, offset + 7, 15)
+        cursor = offset + 22
+        while cursor < offset + 22 + n_bits:
+            payloads.append(decode_packet(message, cursor))
+            cursor += payloads[-1].length
+    else:
+        n_payloads = read_bits(message, offset + 7, 11)
+        cursor = offset + 18
+        for _ in range(n_payloads):
+            payloads.append(decode_packet(message, cursor))
+            cursor += payloads[-1].length
+    return Operator(version, type_id, payloads, cursor - offset)
+
+
 def sum_versions(root: PACKET):
     """Sum up all version in the packet hierarchy"""
     if isinstance(root, Value):
@@ -118,3 +164,108 @@ def evaluate(root: PACKET):
         return root.payload
     else:
         return OPERATORS[root.type_id](map(evaluate, root.payloads))
+
+
+# Streaming evaluation
+# ====================
+# Both the versions and the operations can be evaluated while reading the message:
+# Once all sub-packets of an operator are read, its result is known and the
+# sub-packets are no longer needed. Instead of recursively parsing a tree and then
+# recursively evaluating it, we keep an explicit stack of the operators whose
+# sub-packets are still being read.
+# - An operator is pushed to the stack when its header is read.
+# - Each value is added to the operator on top of the stack.
+# - When an operator has all its sub-packets, it is popped from the stack and its
+#   result is added as a value to the operator below it.
+# The operations sum/product/min/max can be folded one value at a time, so each
+# pending operator only keeps one (or two, for comparisons) values.
+# Memory thus only depends on the nesting depth and not on the message size.
+class BitStream:
+    """Read bits from a stream of hex digits, reading only as many digits as needed"""
+
+    def __init__(self, in_stream: TextIO, chunk_size: int = 4096):
+        self.in_stream = in_stream
+        self.chunk_size = chunk_size
+        self.position = 0
+        self._buffer = 0
+        self._available = 0
+
+    def read(self, count: int) -> int:
+        """Read ``count`` bits as an integer"""
+        while self._available < count:
+            chunk = self.in_stream.read(self.chunk_size)
+            if not chunk:
+                raise EOFError("message ended within a packet")
+            chunk = "".join(chunk.split())
+            if chunk:
+                self._buffer = (self._buffer << 4 * len(chunk)) | int(chunk, 16)
+                self._available += 4 * len(chunk)
+        self._available -= count
+        self.position += count
+        value = self._buffer >> self._available
+        self._buffer &= (1 << self._available) - 1
+        return value
+
+
+# operations that may be applied to their values one at a time
+FOLDING = {0, 1, 2, 3}
+
+
+class PendingOperator:
+    """An operator whose sub-packets are still being read"""
+
+    def __init__(self, type_id: int, end: Optional[int], remaining: Optional[int]):
+        self.type_id = type_id
+        # either the bit position where the sub-packets end...
+        self.end = end
+        # ...or the number of sub-packets still to read
+        self.remaining = remaining
+        self.values = []
+
+    def add(self, value):
+        """Add the value of a sub-packet"""
+        if self.type_id in FOLDING and self.values:
+            self.values[0] = OPERATORS[self.type_id](self.values + [value])
+        else:
+            self.values.append(value)
+        if self.remaining is not None:
+            self.remaining -= 1
+
+    def done(self, position: int) -> bool:
+        """Whether all sub-packets have been read at bit ``position``"""
+        return position >= self.end if self.remaining is None else not self.remaining
+
+    def result(self):
+        return OPERATORS[self.type_id](self.values)
+
+
+def stream_evaluate(in_stream: TextIO, chunk_size: int = 4096) -> tuple[int, Any]:
+    """Sum up all versions and evaluate the operations of a hex message stream"""
+    bits = BitStream(in_stream, chunk_size)
+    stack: list[PendingOperator] = []
+    version_total = 0
+    while True:
+        version_total += bits.read(3)
+        type_id = bits.read(3)
+        if type_id == 4:
+            value, group = 0, 0b10000
+            while group & 0b10000:
+                group = bits.read(5)
+                value = (value << 4) | (group & 0b1111)
+        else:
+            if bits.read(1) == 0:
+                n_bits = bits.read(15)
+                stack.append(PendingOperator(type_id, bits.position + n_bits, None))
+            else:
+                stack.append(PendingOperator(type_id, None, bits.read(11)))
+            if not stack[-1].done(bits.position):
+                continue
+            value = stack.pop().result()
+        # pass the value up to all operators that are completed by it
+        while stack:
+            stack[-1].add(value)
+            if not stack[-1].done(bits.position):
+                break
+            value = stack.pop().result()
+        else:
+            return version_total, value
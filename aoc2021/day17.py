@@ -1,6 +1,7 @@
 from typing import NamedTuple
 from io import StringIO
 import math
+import bisect
 
 
 class Target(NamedTuple):
@@ -33,7 +34,7 @@ def triangular(n: int) -> int:
 
 def solve(in_stream: StringIO) -> tuple[object, object]:
     target = Target.parse(in_stream.readline())
-    return triangular(max_y(target)), len(valid_velocities(target))
+    return triangular(max_y(target)), count_velocities(target)
 
 
 def min_x(target: Target) -> int:
@@ -97,3 +98,50 @@ def hits(x_vel: int, y_vel: int, target: Target) -> bool:
         y_vel -= 1
         x_vel = 0 if x_vel == 0 else x_vel - 1
     return False
+
+
+# Step-indexed counting
+# =====================
+# The x and y movements are independent of each other: a velocity hits the target if
+# there is some step `t` at which x is inside the x-band and y is inside the y-band.
+# Instead of simulating every pair of velocities, we can check for each step which
+# x and y velocities are inside their band – the position at step `t` has a closed
+# form, so the matching velocities are a range that we can compute directly:
+# - `y_t = v * t - t * (t - 1) / 2`, so `v` is in the y-band for
+#   `(y_min + t * (t - 1) / 2) / t <= v <= (y_max + t * (t - 1) / 2) / t`.
+# - `x_t` follows the same formula as long as `t <= u`. After that, the probe has
+#   stalled at `x = triangular(u)` – if that is inside the x-band, it stays inside
+#   for all later steps.
+# Since the target is below and to the right, each velocity is inside its band for
+# a *contiguous* range of steps. A pair of velocities hits iff their ranges overlap.
+# Counting overlapping pairs does not need to check every pair: a pair does *not*
+# overlap if the x range ends before the y range starts or vice versa. By sorting the
+# range ends, we can count these pairs for each velocity by bisection.
+def count_velocities(target: Target) -> int:
+    """Count the velocities that hit the `target`"""
+    x_first, x_last, y_first, y_last = {}, {}, {}, {}
+    # the highest throw is `max_y`, which reaches the target after this many steps
+    for step in range(1, 2 * abs(target.y_min) + 1):
+        offset = triangular(step - 1)
+        for y_vel in range(
+            -((-target.y_min - offset) // step), (target.y_max + offset) // step + 1
+        ):
+            y_first.setdefault(y_vel, step)
+            y_last[y_vel] = step
+        for x_vel in range(
+            max(step, -((-target.x_min - offset) // step)),
+            (target.x_max + offset) // step + 1,
+        ):
+            x_first.setdefault(x_vel, step)
+            x_last[x_vel] = step
+    for x_vel in range(min_x(target), max_x(target) + 1):
+        if target.x_min <= triangular(x_vel) <= target.x_max:
+            # stalled velocities reach their final position at step `x_vel`
+            x_first.setdefault(x_vel, x_vel)
+            x_last[x_vel] = math.inf
+    x_lasts, y_lasts = sorted(x_last.values()), sorted(y_last.values())
+    return (
+        len(x_first) * len(y_first)
+        - sum(bisect.bisect_left(x_lasts, first) for first in y_first.values())
+        - sum(bisect.bisect_left(y_lasts, first) for first in x_first.values())
+    )
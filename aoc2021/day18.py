@@ -1,7 +1,11 @@
+from typing import Optional
 from io import StringIO
 from dataclasses import dataclass
+from array import array
 import math
 import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
 
 
 # We use two separate representations of "Snail Numbers":
@@ -120,8 +124,8 @@ def format_sn(sn: FlatNumber) -> str:
 
 
 def solve(in_stream: StringIO) -> tuple[object, object]:
-    numbers = [parse_sn(line.strip()) for line in in_stream]
-    return magnitude(pairs(add_all(numbers))), highest_magnitude(numbers)
+    numbers = [parse_heap(line.strip()) for line in in_stream]
+    return heap_magnitude(heap_add_all(numbers)), highest_pair(numbers)[0]
 
 
 def add_all(numbers: list[FlatNumber]):
@@ -136,3 +140,176 @@ def highest_magnitude(numbers: list[FlatNumber]):
             if mag > highest:
                 highest = mag
     return highest
+
+
+# Fixed-size heap numbers
+# =======================
+# A reduced number never nests deeper than 4 pairs, and the sum of two reduced
+# numbers never nests deeper than 5 pairs. So every number fits into a *complete*
+# binary tree of 6 levels – 63 slots – which we store in a single array without
+# any per-node objects. As in a binary heap, the children of slot `i` are at slots
+# `2 * i + 1` and `2 * i + 2` and its parent is at slot `(i - 1) // 2`.
+# Each slot is either a regular number (>= 0), a pair, or empty.
+# - Adding two numbers moves each level of both numbers one level down, which are
+#   just slice copies of contiguous slots.
+# - Exploding only happens for pairs of numbers at the deepest level.
+# - Splitting turns a number into a pair by filling in its two children.
+# - The regular numbers next to another number are found via the deepest level:
+#   the slot left of a number's leftmost descendant in the deepest level belongs to
+#   the subtree of the number to its left, which is the first non-empty slot upwards.
+HeapNumber = array
+PAIR, EMPTY = -1, -2
+SLOTS, DEEPEST = 63, 31
+
+
+def _in_order(index: int = 0) -> list[int]:
+    if index >= SLOTS:
+        return []
+    return _in_order(2 * index + 1) + [index] + _in_order(2 * index + 2)
+
+
+# all slots from left to right – since numbers have no children, visiting only the
+# numbers in this order visits them from left to right as well
+IN_ORDER = tuple(_in_order())
+POSITION = {index: position for position, index in enumerate(IN_ORDER)}
+
+
+def parse_heap(literal: str) -> HeapNumber:
+    sn = array("h", [EMPTY]) * SLOTS
+    index = 0
+    for token in literal:
+        if token == "[":
+            sn[index] = PAIR
+            index = 2 * index + 1
+        elif token == ",":
+            index += 1
+        elif token == "]":
+            index = (index - 1) // 2
+        else:
+            sn[index] = int(token)
+    return sn
+
+
+def heap_pairs(sn: HeapNumber, index: int = 0) -> TreeNumber:
+    if sn[index] != PAIR:
+        return sn[index]
+    return [heap_pairs(sn, 2 * index + 1), heap_pairs(sn, 2 * index + 2)]
+
+
+def heap_magnitude(sn: HeapNumber) -> int:
+    magnitudes = list(sn)
+    for index in range(DEEPEST - 1, -1, -1):
+        if sn[index] == PAIR:
+            magnitudes[index] = (
+                3 * magnitudes[2 * index + 1] + 2 * magnitudes[2 * index + 2]
+            )
+    return magnitudes[0]
+
+
+def _explode(sn: HeapNumber, index: int) -> int:
+    """Explode the pair at `index` and return the slot of its left neighbour"""
+    left, right = 2 * index + 1, 2 * index + 2
+    left_neighbour = index
+    if left > DEEPEST:
+        left_neighbour = left - 1
+        while sn[left_neighbour] == EMPTY:
+            left_neighbour = (left_neighbour - 1) // 2
+        sn[left_neighbour] += sn[left]
+    if right < SLOTS - 1:
+        neighbour = right + 1
+        while sn[neighbour] == EMPTY:
+            neighbour = (neighbour - 1) // 2
+        sn[neighbour] += sn[right]
+    sn[index], sn[left], sn[right] = 0, EMPTY, EMPTY
+    return left_neighbour
+
+
+def heap_reduce(sn: HeapNumber) -> HeapNumber:
+    # Exploding never creates new pairs at the deepest level, so one pass suffices.
+    for index in range(DEEPEST, SLOTS, 2):
+        if sn[index] >= 0:
+            _explode(sn, (index - 1) // 2)
+    # All numbers left of `position` (in IN_ORDER) are known not to need splitting.
+    position = 0
+    while True:
+        for position, index in enumerate(IN_ORDER[position:], start=position):
+            if sn[index] > 9:
+                break
+        else:
+            return sn
+        number = sn[index]
+        sn[index] = PAIR
+        sn[2 * index + 1], sn[2 * index + 2] = number // 2, number - number // 2
+        # A split on the level above the deepest immediately explodes again. This
+        # may change the number on the left, so we have to resume scanning there.
+        if 2 * index + 1 >= DEEPEST:
+            position = POSITION[_explode(sn, index)]
+        else:
+            position = POSITION[2 * index + 1]
+
+
+def heap_add(left: HeapNumber, right: HeapNumber) -> HeapNumber:
+    sn = array("h", [EMPTY]) * SLOTS
+    sn[0] = PAIR
+    for level in range(5):
+        start, width = 2 ** level - 1, 2 ** level
+        target = 2 * start + 1
+        sn[target : target + width] = left[start : start + width]
+        sn[target + width : target + 2 * width] = right[start : start + width]
+    return heap_reduce(sn)
+
+
+def heap_add_all(numbers: list[HeapNumber]) -> HeapNumber:
+    return functools.reduce(heap_add, numbers)
+
+
+# Parallel pairwise search
+# ========================
+# Snailfish addition is not commutative, so `a + b` and `b + a` are separate
+# candidates: we have to try every *ordered* pair of distinct numbers.
+# Each candidate is independent of all others, so we can distribute them across
+# several processes. To avoid sending the numbers with every task, each worker
+# process receives all numbers once when it starts; tasks then only describe which
+# pairs to try – a range of left-hand numbers, paired with every right-hand number.
+# Starting the pool takes about as long as searching a few thousand pairs, so small
+# inputs such as the puzzle input are searched serially unless `workers` is given.
+SERIAL_PAIRS = 10000
+_worker_numbers: list[HeapNumber] = []
+
+
+def _init_worker(numbers: list[HeapNumber]):
+    global _worker_numbers
+    _worker_numbers = numbers
+
+
+def _highest_in_rows(start: int, stop: int) -> tuple[int, int, int]:
+    """Highest magnitude and its pair for all left-hand numbers in `start:stop`"""
+    numbers = _worker_numbers
+    return max(
+        (heap_magnitude(heap_add(numbers[i], numbers[j])), i, j)
+        for i in range(start, stop)
+        for j in range(len(numbers))
+        if i != j
+    )
+
+
+def highest_pair(
+    numbers: list[HeapNumber], workers: Optional[int] = None
+) -> tuple[int, int, int]:
+    """Find the highest magnitude of adding any two `numbers` and their indices"""
+    if len(numbers) < 2:
+        raise ValueError("at least two numbers are required to form a pair")
+    if workers is None:
+        pairs = len(numbers) * (len(numbers) - 1)
+        workers = 1 if pairs <= SERIAL_PAIRS else (os.cpu_count() or 1)
+    # several tasks per worker balance out differences in the cost of tasks
+    chunk = max(1, len(numbers) // (4 * workers))
+    starts = range(0, len(numbers), chunk)
+    stops = [min(start + chunk, len(numbers)) for start in starts]
+    if workers == 1:
+        _init_worker(numbers)
+        return max(map(_highest_in_rows, starts, stops))
+    with ProcessPoolExecutor(
+        workers, initializer=_init_worker, initargs=(numbers,)
+    ) as executor:
+        return max(executor.map(_highest_in_rows, starts, stops))
@@ -1,7 +1,10 @@
-from typing import Hashable
+from typing import Hashable, Optional
 from io import StringIO
-from collections import Counter
+from collections import Counter, deque
+from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
 import ast
+import os
 
 
 # Solution notice:
@@ -119,7 +122,7 @@ def parse(in_stream: StringIO) -> list[Scanner]:
 
 def solve(in_stream: StringIO) -> tuple[object, object]:
     scanners = parse(in_stream)
-    reorient_all(scanners)
+    align_all(scanners)
     beacons = {beacon for scanner in scanners for beacon in scanner.beacons}
     max_manhattan = max(
         manhattan(a.offset, b.offset) for a in scanners for b in scanners
@@ -158,7 +161,20 @@ def reorient_all(scanners: list[Scanner]):
             break
 
 
+TRANSFORM = tuple[tuple[int, ...], tuple[int, ...], COORD]
+
+
 def reorient(fixed: Scanner, candidate: Scanner) -> bool:
+    """Reorient `candidate` to the frame of `fixed` if they overlap"""
+    transform = find_transform(fixed, candidate)
+    if transform is None:
+        return False
+    candidate.reorient(*transform)
+    return True
+
+
+def find_transform(fixed: Scanner, candidate: Scanner) -> Optional[TRANSFORM]:
+    """Find the transformation from the frame of `candidate` to that of `fixed`"""
     overlaps = fixed.distances.keys() & candidate.distances.keys()
     # For each *potentially* overlapping pair, we compute *several* possible
     # translations that brings the candidate in line with the fixed reference.
@@ -211,10 +227,284 @@ def reorient(fixed: Scanner, candidate: Scanner) -> bool:
                                 orientation,
                                 shift(translated, fixed_beacon),
                             ] += 1
+    # no pair was unambiguous enough to suggest any orientation
+    if not translation:
+        return None
     # the most common orientation
-    [[[permutation, orientation, offset], count]] = translation.most_common(1)
+    [[transform, count]] = translation.most_common(1)
     # safety measure in case we did not manage to find a clear reorientation
     if len(translation) > 1 and count < 2 * translation.most_common(2)[-1][1]:
+        return None
+    return transform
+
+
+# Global fingerprint index
+# ========================
+# `reorient_all` compares the profiles of the same scanners over and over again,
+# since it restarts its search after every match. Yet the profiles never change
+# by reorienting a scanner – only the beacon coordinates do.
+# So we can instead build a single index of which scanners have which `pair_key`
+# once, and derive how much *every* pair of scanners overlaps from it in one go.
+# This gives us a graph of scanners that likely overlap. Starting with scanner 0,
+# we visit this graph breadth-first: each aligned scanner is used once to align all
+# its unaligned neighbours. Thus, each pair of scanners is tried at most once.
+class FingerprintIndex:
+    """Index of all scanner beacon pairs by their `pair_key`"""
+
+    def __init__(self, scanners: list[Scanner]):
+        self.index: dict[Hashable, dict[int, list[tuple[COORD, COORD]]]] = {}
+        for scanner in scanners:
+            for key, pairs in scanner.distances.items():
+                self.index.setdefault(key, {})[scanner.ident] = pairs
+
+    def overlaps(self) -> Counter[tuple[int, int]]:
+        """Count the shared pair keys between all pairs of scanners"""
+        # This is the same as the size of the profile intersection of each pair
+        scores = Counter()
+        for entries in self.index.values():
+            # most keys are seen by only one scanner and do not contribute
+            if len(entries) < 2:
+                continue
+            for a, b in combinations(sorted(entries), 2):
+                scores[a, b] += min(len(entries[a]), len(entries[b]))
+        return scores
+
+
+def align_all(scanners: list[Scanner]):
+    """Reorient all scanners in relation to Scanner 0"""
+    overlap = 3 if len(scanners[0].beacons[0]) == 2 else 12
+    by_ident = {scanner.ident: scanner for scanner in scanners}
+    candidates: dict[int, list[tuple[int, int]]] = {ident: [] for ident in by_ident}
+    # Scanners sharing `overlap` beacons also share all pairs of these beacons.
+    min_pairs = overlap * (overlap - 1) // 2
+    for (a, b), score in FingerprintIndex(scanners).overlaps().items():
+        if score >= min_pairs:
+            candidates[a].append((score, b))
+            candidates[b].append((score, a))
+    aligned = {scanners[0].ident}
+    queue = deque([scanners[0]])
+    while queue:
+        fixed_scanner = queue.popleft()
+        # try the most promising candidates first
+        for _, ident in sorted(candidates[fixed_scanner.ident], reverse=True):
+            if ident not in aligned and reorient(fixed_scanner, by_ident[ident]):
+                aligned.add(ident)
+                queue.append(by_ident[ident])
+    if len(aligned) != len(scanners):
+        raise ValueError(f"scanners {set(by_ident) - aligned} could not be aligned")
+
+
+# Parallel alignment
+# ==================
+# Finding the transformation between two scanners is independent of all other
+# scanners – as long as we do not require one of them to be aligned already.
+# Instead of reorienting scanners one after another, we can find the transformations
+# between the *original* frames of all candidate pairs at once, in parallel.
+# Afterwards, we only need to chain the transformations from each scanner to
+# scanner 0. A breadth-first search gives a spanning tree of shortest chains; each
+# scanner's transformation is the one of its parent in the tree combined with the
+# one from the scanner to its parent.
+def transform_coord(transform: TRANSFORM, a: COORD) -> COORD:
+    """Apply a transformation to `a`"""
+    permutation, orientation, offset = transform
+    return shift(orient(permute(a, permutation), orientation), offset)
+
+
+def compose(outer: TRANSFORM, inner: TRANSFORM) -> TRANSFORM:
+    """Combine two transformations to one that applies `inner` and then `outer`"""
+    outer_permutation, outer_orientation, outer_offset = outer
+    inner_permutation, inner_orientation, inner_offset = inner
+    # outer(inner(a))[k] == outer_orientation[k] * inner(a)[outer_permutation[k]]
+    permutation = tuple(inner_permutation[i] for i in outer_permutation)
+    orientation = tuple(
+        sign * inner_orientation[i]
+        for sign, i in zip(outer_orientation, outer_permutation)
+    )
+    offset = tuple(
+        a + b
+        for a, b in zip(
+            orient(permute(inner_offset, outer_permutation), outer_orientation),
+            outer_offset,
+        )
+    )
+    return permutation, orientation, offset
+
+
+def invert(transform: TRANSFORM) -> TRANSFORM:
+    """Reverse a transformation"""
+    permutation, orientation, offset = transform
+    inverse_permutation = tuple(permutation.index(i) for i in range(len(permutation)))
+    inverse_orientation = permute(orientation, inverse_permutation)
+    # undo the offset, then the orientation and permutation
+    inverse_offset = tuple(
+        -value
+        for value in orient(permute(offset, inverse_permutation), inverse_orientation)
+    )
+    return inverse_permutation, inverse_orientation, inverse_offset
+
+
+_worker_scanners: dict[int, Scanner] = {}
+
+
+def _init_worker(scanners: list[Scanner]):
+    global _worker_scanners
+    _worker_scanners = {scanner.ident: scanner for scanner in scanners}
+
+
+def _pair_transform(pair: tuple[int, int]) -> tuple[int, int, Optional[TRANSFORM]]:
+    fixed, candidate = pair
+    return (
+        fixed,
+        candidate,
+        find_transform(_worker_scanners[fixed], _worker_scanners[candidate]),
+    )
+
+
+def align_parallel(scanners: list[Scanner], workers: Optional[int] = None):
+    """Reorient all scanners in relation to Scanner 0 using `workers` processes"""
+    overlap = 3 if len(scanners[0].beacons[0]) == 2 else 12
+    min_pairs = overlap * (overlap - 1) // 2
+    pairs = [
+        pair
+        for pair, score in FingerprintIndex(scanners).overlaps().items()
+        if score >= min_pairs
+    ]
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if workers == 1:
+        _init_worker(scanners)
+        results = list(map(_pair_transform, pairs))
+    else:
+        with ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(scanners,)
+        ) as executor:
+            results = list(
+                executor.map(
+                    _pair_transform,
+                    pairs,
+                    chunksize=max(1, len(pairs) // (4 * workers)),
+                )
+            )
+    # transformations *from* a scanner *to* its neighbours
+    edges: dict[int, dict[int, TRANSFORM]] = {scanner.ident: {} for scanner in scanners}
+    for fixed, candidate, transform in results:
+        if transform is not None:
+            edges[candidate][fixed] = transform
+            edges[fixed][candidate] = invert(transform)
+    # transformations from each scanner to scanner 0
+    root = scanners[0]
+    to_root = {
+        root.ident: (
+            tuple(range(len(root.offset))),
+            (1,) * len(root.offset),
+            root.offset,
+        )
+    }
+    queue = deque([root.ident])
+    while queue:
+        parent = queue.popleft()
+        for child in edges[parent]:
+            if child not in to_root:
+                to_root[child] = compose(to_root[parent], edges[child][parent])
+                queue.append(child)
+    if len(to_root) != len(scanners):
+        unaligned = {scanner.ident for scanner in scanners} - to_root.keys()
+        raise ValueError(f"scanners {unaligned} could not be aligned")
+    for scanner in scanners[1:]:
+        scanner.reorient(*to_root[scanner.ident])
+
+
+# Incremental reconstruction
+# ==========================
+# When scanner reports arrive one by one, we can keep all scanners aligned so far
+# and only align each new scanner against them. The first scanner defines the frame
+# of the map. A new scanner that does not overlap the map (yet) is parked until
+# another scanner connects it.
+# The pair keys of all aligned scanners are indexed, so candidate overlaps for a new
+# scanner are found just from its own keys. The pair keys of parked scanners are
+# indexed as well, so each newly aligned scanner is only tried against the parked
+# scanners it likely overlaps. Every scanner unparked this way is a newly aligned
+# scanner in turn, which may unpark even more scanners.
+# The number of beacons and the maximum distance between scanners are updated with
+# each aligned scanner.
+class ScannerMap:
+    """Map of scanners and beacons that is reconstructed incrementally"""
+
+    def __init__(self):
+        self.scanners: dict[int, Scanner] = {}
+        self.parked: dict[int, Scanner] = {}
+        self.beacons: set[COORD] = set()
+        self.max_distance = 0
+        # number of pairs per key and aligned or parked scanner, respectively
+        self._index: dict[Hashable, dict[int, int]] = {}
+        self._parked_index: dict[Hashable, dict[int, int]] = {}
+
+    @property
+    def beacon_count(self) -> int:
+        return len(self.beacons)
+
+    def add_scanner(self, report: str) -> bool:
+        """Add a scanner report, returning whether it could be aligned already"""
+        scanner = Scanner.from_input(StringIO(report))
+        if self.scanners and not self._align(scanner):
+            self._park(scanner)
+            return False
+        queue = deque([scanner])
+        while queue:
+            aligned = queue.popleft()
+            self._insert(aligned)
+            queue.extend(self._unpark(aligned))
+        return True
+
+    @staticmethod
+    def _candidates(
+        scanner: Scanner, index: dict[Hashable, dict[int, int]]
+    ) -> list[int]:
+        """Idents of indexed scanners that likely overlap `scanner`, best first"""
+        overlap = 3 if len(scanner.beacons[0]) == 2 else 12
+        scores = Counter()
+        for key, count in scanner.profile.items():
+            for ident, indexed_count in index.get(key, {}).items():
+                scores[ident] += min(count, indexed_count)
+        return [
+            ident
+            for ident, score in scores.most_common()
+            if score >= overlap * (overlap - 1) // 2
+        ]
+
+    def _align(self, scanner: Scanner) -> bool:
+        """Try to align `scanner` to the map"""
+        for ident in self._candidates(scanner, self._index):
+            if reorient(self.scanners[ident], scanner):
+                return True
         return False
-    candidate.reorient(permutation, orientation, offset)
-    return True
+
+    def _park(self, scanner: Scanner):
+        """Park an unaligned `scanner` until another scanner connects it"""
+        self.parked[scanner.ident] = scanner
+        for key, count in scanner.profile.items():
+            self._parked_index.setdefault(key, {})[scanner.ident] = count
+
+    def _unpark(self, aligned: Scanner) -> list[Scanner]:
+        """Align and unpark all parked scanners that overlap the `aligned` scanner"""
+        unparked = []
+        for ident in self._candidates(aligned, self._parked_index):
+            if reorient(aligned, self.parked[ident]):
+                scanner = self.parked.pop(ident)
+                for key in scanner.profile:
+                    entries = self._parked_index[key]
+                    del entries[ident]
+                    if not entries:
+                        del self._parked_index[key]
+                unparked.append(scanner)
+        return unparked
+
+    def _insert(self, scanner: Scanner):
+        """Insert an aligned `scanner` into the map"""
+        for other in self.scanners.values():
+            self.max_distance = max(
+                self.max_distance, manhattan(scanner.offset, other.offset)
+            )
+        self.scanners[scanner.ident] = scanner
+        self.beacons.update(scanner.beacons)
+        for key, count in scanner.profile.items():
+            self._index.setdefault(key, {})[scanner.ident] = count
@@ -1,6 +1,11 @@
 from io import StringIO
-from typing import Iterable, Iterator
+from typing import Iterable, Iterator, Optional
 from functools import lru_cache
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import os
+import sys
 
 
 # The standard approach for sparse Black/White images is a set of "switched on" pixels
@@ -31,13 +36,13 @@ def read_input(in_stream: StringIO) -> tuple[str, IMAGE_MASK]:
 
 def solve(in_stream: StringIO) -> tuple[object, object]:
     key, image = read_input(in_stream)
+    lookup, image = to_rows(key, image)
     for _ in range(2):
-        image = enhance(image, key)
+        image = enhance_rows(image, lookup)
     long_image = image
     for _ in range(48):
-        long_image = enhance(long_image, key)
-    neighbours.cache_clear()
-    return len(image[0]), len(long_image[0])
+        long_image = enhance_rows(long_image, lookup)
+    return lit_pixels(image), lit_pixels(long_image)
 
 
 @lru_cache(maxsize=None)
@@ -82,3 +87,186 @@ def minmax(it: Iterator[int]) -> tuple[int, int]:
 def bounds(image: IMAGE_MASK) -> tuple[tuple[int, int], tuple[int, int]]:
     # (min_row, max_row), (min_column, max_column)
     return minmax(row for row, _ in image[0]), minmax(column for _, column in image[0])
+
+
+# Row-wise enhancement
+# ====================
+# Instead of looking up each pixel's neighbours in a set, we store the image as dense
+# rows of bytes – one byte of 0 or 1 per pixel – and explicitly track the bit of the
+# infinite background. Each step grows the image by one pixel on each side, since
+# only these pixels can differ from the new background.
+# The key index of a pixel consists of three 3-bit groups, one per row. Going along
+# a row, the index "rolls": the window shifts left by one and the next column comes
+# in at the right. We compute this window for an entire row at once using integers:
+# - Each row of bytes is spread into 16-bit lanes of one large integer.
+# - The three rows' bits per column are combined to a column code via
+#   `top * 64 + middle * 8 + bottom` – since no lane overflows, this is done for all
+#   columns at once.
+# - The window of a column is its column code and those of the next two columns,
+#   `code[k] * 4 + code[k + 1] * 2 + code[k + 2]`. Shifting the integer by 16 bits
+#   moves the code of the next column into the lane of the current one.
+# All of this is big integer arithmetic and runs at C speed; only looking up the key
+# for each window runs per pixel.
+ROW_IMAGE = tuple[list[bytes], int]
+
+
+def to_rows(key: str, image: IMAGE_MASK) -> tuple[bytes, ROW_IMAGE]:
+    """Convert a key and sparse image to a key lookup table and row image"""
+    mask, inverted = image
+    (min_row, max_row), (min_column, max_column) = bounds(image)
+    rows = [bytearray(max_column - min_column + 1) for _ in range(min_row, max_row + 1)]
+    for row, column in mask:
+        rows[row - min_row][column - min_column] = 1
+    if inverted:
+        rows = [bytes(pixel ^ 1 for pixel in row) for row in rows]
+    lookup = bytes(pixel == "#" for pixel in key)
+    return lookup, ([bytes(row) for row in rows], int(inverted))
+
+
+def _lanes(row: bytes) -> int:
+    """Spread the bytes of `row` to 16-bit lanes of an integer"""
+    spread = bytearray(2 * len(row))
+    spread[0::2] = row
+    return int.from_bytes(spread, "little")
+
+
+def enhance_rows(image: ROW_IMAGE, lookup: bytes) -> ROW_IMAGE:
+    """Apply one enhancement step to the row `image` using the `lookup` key"""
+    rows, background = image
+    width = len(rows[0]) + 4
+    padding = bytes([background]) * 2
+    border = _lanes(bytes([background]) * width)
+    lanes = [border, border]
+    lanes.extend(_lanes(padding + row + padding) for row in rows)
+    lanes += [border, border]
+    new_rows = []
+    for top, middle, bottom in zip(lanes, lanes[1:], lanes[2:]):
+        codes = top * 64 + middle * 8 + bottom
+        windows = (codes << 2) + ((codes >> 16) << 1) + (codes >> 32)
+        indices = array("H", windows.to_bytes(2 * width, "little")[: 2 * width - 4])
+        if sys.byteorder == "big":
+            indices.byteswap()
+        new_rows.append(bytes(map(lookup.__getitem__, indices)))
+    return new_rows, lookup[511 if background else 0]
+
+
+def lit_pixels(image: ROW_IMAGE) -> int:
+    """Count the lit pixels of a finite image"""
+    rows, background = image
+    if background:
+        raise ValueError("an image with lit background has infinite lit pixels")
+    return sum(row.count(1) for row in rows)
+
+
+# Tiled parallel enhancement
+# ==========================
+# Each enhanced pixel only depends on the pixels directly around it. So we can split
+# the image into horizontal bands and enhance each band separately – as long as each
+# band also has the rows next to it, its "halo". After `k` steps, a row depends on the
+# `k` rows above and below it in the *previous* image, so bands need a `k` row halo
+# on either side to do `k` steps before exchanging rows with the other bands.
+# Since the image grows by one row on either side each step, a final row `r` depends
+# on the original rows `r - 2 * k` to `r`. The background is the same for all bands,
+# so bands at the top and bottom need no halo beyond the image.
+# The bands are enhanced in worker processes. All of them read the same input image
+# from one shared memory buffer and write their rows into one shared output buffer,
+# so neither image has to be sent between processes.
+def _enhance_band(
+    source: str,
+    target: str,
+    width: int,
+    rows: tuple[int, int],
+    band: tuple[int, int],
+    background: int,
+    lookup: bytes,
+    steps: int,
+):
+    """Enhance the final rows `band` from the source rows `rows` by `steps`"""
+    (first, last), (start, stop) = rows, band
+    source_memory, target_memory = SharedMemory(source), SharedMemory(target)
+    try:
+        image = _read_rows(source_memory, width, first, last), background
+        for _ in range(steps):
+            image = enhance_rows(image, lookup)
+        # final row `r` is row `r - first` of the band result
+        new_width = width + 2 * steps
+        target_memory.buf[start * new_width : stop * new_width] = b"".join(
+            image[0][start - first : stop - first]
+        )
+    finally:
+        source_memory.close()
+        target_memory.close()
+
+
+def _read_rows(memory: SharedMemory, width: int, first: int, last: int) -> list[bytes]:
+    return [
+        bytes(memory.buf[row * width : (row + 1) * width]) for row in range(first, last)
+    ]
+
+
+def _band_tasks(height: int, steps: int, workers: int):
+    """Split an image into bands of final rows and the source rows they need"""
+    new_height = height + 2 * steps
+    # several bands per worker balance out differences in runtime
+    band_height = -(-new_height // (4 * workers))
+    for start in range(0, new_height, band_height):
+        stop = min(start + band_height, new_height)
+        yield (max(0, start - 2 * steps), min(height, stop)), (start, stop)
+
+
+def enhance_tiled(
+    image: ROW_IMAGE,
+    lookup: bytes,
+    steps: int,
+    halo: int = 4,
+    workers: Optional[int] = None,
+) -> ROW_IMAGE:
+    """Apply `steps` enhancement steps to `image` in bands of `workers` processes"""
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    rows, background = image
+    height, width = len(rows), len(rows[0])
+    source = SharedMemory(create=True, size=height * width)
+    source.buf[: height * width] = b"".join(rows)
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        while steps:
+            round_steps = min(halo, steps)
+            new_width = width + 2 * round_steps
+            target = SharedMemory(
+                create=True, size=(height + 2 * round_steps) * new_width
+            )
+            tasks = [
+                (
+                    source.name,
+                    target.name,
+                    width,
+                    source_rows,
+                    band,
+                    background,
+                    lookup,
+                    round_steps,
+                )
+                for source_rows, band in _band_tasks(height, round_steps, workers)
+            ]
+            # drop the old image even if some band fails, but keep the new one
+            source.close()
+            try:
+                if executor is None:
+                    for task in tasks:
+                        _enhance_band(*task)
+                else:
+                    for future in [executor.submit(_enhance_band, *t) for t in tasks]:
+                        future.result()
+            finally:
+                source.unlink()
+                source = target
+            height, width = height + 2 * round_steps, new_width
+            for _ in range(round_steps):
+                background = lookup[511 if background else 0]
+            steps -= round_steps
+        return _read_rows(source, width, 0, height), background
+    finally:
+        source.close()
+        source.unlink()
+        if executor is not None:
+            executor.shutdown()
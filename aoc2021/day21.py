@@ -1,5 +1,7 @@
+from typing import NamedTuple, Optional
 from io import StringIO
 from collections import defaultdict
+from functools import lru_cache
 from itertools import cycle, product
 
 
@@ -11,9 +13,8 @@ def parse(in_stream: StringIO) -> tuple[int, int]:
 
 def solve(in_stream: StringIO) -> tuple[object, object]:
     players = parse(in_stream)
-    second, throws = play_deterministic(*players, target=1000)
-    player_moves = [winning_moves(player, target=21) for player in players]
-    return second * throws, dirac_winner(*player_moves)
+    second, throws = play_fast_forward(*players, target=1000)
+    return second * throws, max(dirac_wins(players, DiracRules()))
 
 
 def play_deterministic(*players: int, target: int) -> tuple[int, int]:
@@ -32,6 +33,48 @@ def play_deterministic(*players: int, target: int) -> tuple[int, int]:
                 return scores[(player + 1) % 2], throws
 
 
+# Fast-forwarding deterministic play
+# ==================================
+# The deterministic die only matters modulo 10, since the board has 10 fields.
+# After each round of all players, the entire game is thus described by the players'
+# positions and how many throws happened modulo 10 – plus the scores, which only
+# ever increase. Once these positions and die phase repeat, each following cycle
+# of rounds repeats the same moves and adds the same score to each player.
+# We can then skip as many whole cycles as are guaranteed to not let anyone reach the
+# target, and simulate only the remainder to see who wins.
+def play_fast_forward(*players: int, target: int) -> tuple[int, int]:
+    """Play with the deterministic die, skipping repeated cycles of rounds"""
+    scores = [0] * len(players)
+    positions = list(players)
+    throws = 0
+    # (positions, die phase) -> (throws, scores) after a round
+    seen: Optional[dict[tuple[tuple[int, ...], int], tuple[int, list[int]]]] = {}
+    while True:
+        for player in range(len(players)):
+            # the die shows throws + 1, throws + 2 and throws + 3 modulo 10
+            positions[player] = (positions[player] + 3 * throws + 6 - 1) % 10 + 1
+            throws += 3
+            scores[player] += positions[player]
+            if scores[player] >= target:
+                return min(scores[:player] + scores[player + 1 :]), throws
+        if seen is None:
+            continue
+        state = tuple(positions), throws % 10
+        if state not in seen:
+            seen[state] = throws, scores.copy()
+            continue
+        previous_throws, previous_scores = seen[state]
+        gains = [score - previous for score, previous in zip(scores, previous_scores)]
+        # each cycle must end with every player below the target minus its gain
+        cycles = min(
+            (target - 1 - score - gain) // gain for score, gain in zip(scores, gains)
+        )
+        if cycles > 0:
+            scores = [score + cycles * gain for score, gain in zip(scores, gains)]
+            throws += cycles * (throws - previous_throws)
+        seen = None
+
+
 # part 2
 
 
@@ -103,3 +146,77 @@ def dirac_winner(pl1_moves: DIRAC_MOVES, pl2_moves: DIRAC_MOVES) -> int:
         for pl2_move, pl2_count in pl2_wins.items()
     )
     return max(player1_wins, player2_wins)
+
+
+# Generalised Dirac Dice
+# ======================
+# The players never interact – each player's game only depends on their own throws.
+# The number of universes in which a game ends some way is thus the *product* of the
+# universes of each player's game. For player `i` to win in their `m`th move
+#   - player `i` must reach the target in exactly `m` moves,
+#   - every player before `i` must still be active after `m` moves, and
+#   - every player after `i` must still be active after `m - 1` moves.
+# This is the same as `dirac_winner` but for any number of players.
+# The universes of a single player's game are tracked per move as a flat list
+# indexed by `position * target + score`. Since a player's game only depends on the
+# rules and their starting position, we compute it for all starting positions once.
+class DiracRules(NamedTuple):
+    """Rules for a game of Dirac Dice"""
+
+    board: int = 10
+    sides: int = 3
+    throws: int = 3
+    target: int = 21
+
+
+# (universes winning in exactly n moves, universes active after n moves)
+PLAYER_OUTCOME = tuple[tuple[int, ...], tuple[int, ...]]
+
+
+@lru_cache(maxsize=None)
+def player_outcomes(rules: DiracRules) -> tuple[PLAYER_OUTCOME, ...]:
+    """The universes won and active per move for each starting position"""
+    board, target = rules.board, rules.target
+    throws = dirac_counts(rules.sides, rules.throws).items()
+    outcomes = []
+    for start in range(board):
+        universes = [0] * (board * target)
+        universes[start * target] = 1
+        wins, active = [0], [1]
+        while active[-1]:
+            new_universes, completed = [0] * (board * target), 0
+            for index, count in enumerate(universes):
+                if not count:
+                    continue
+                # positions are zero-based but scored one-based
+                position, score = divmod(index, target)
+                for throw, throw_count in throws:
+                    new_position = (position + throw) % board
+                    new_score = score + new_position + 1
+                    if new_score >= target:
+                        completed += count * throw_count
+                    else:
+                        new_universes[new_position * target + new_score] += (
+                            count * throw_count
+                        )
+            universes = new_universes
+            wins.append(completed)
+            active.append(sum(universes))
+        outcomes.append((tuple(wins), tuple(active)))
+    return tuple(outcomes)
+
+
+def dirac_wins(players: tuple[int, ...], rules: DiracRules) -> list[int]:
+    """Count the universes in which each player wins"""
+    outcomes = [player_outcomes(rules)[position - 1] for position in players]
+    player_wins = []
+    for player, (wins, _) in enumerate(outcomes):
+        total = 0
+        for moves, count in enumerate(wins):
+            for other, (_, active) in enumerate(outcomes):
+                if other != player and count:
+                    other_moves = moves if other < player else moves - 1
+                    count *= active[other_moves] if other_moves < len(active) else 0
+            total += count
+        player_wins.append(total)
+    return player_wins
@@ -1,6 +1,8 @@
-from typing import NamedTuple
+from typing import NamedTuple, Optional
 from io import StringIO
 from math import prod
+from itertools import product
+from statistics import median
 
 
 class Cube(NamedTuple):
@@ -102,8 +104,8 @@ def parse(in_stream: StringIO) -> INSTRUCTIONS:
 
 
 def solve(in_stream: StringIO) -> tuple[object, object]:
-    instructions = parse(in_stream)
-    return reboot_core(instructions), reboot_all(instructions)
+    reactor = reboot_indexed(parse(in_stream))
+    return reactor.volume_in(CORE), reactor.volume
 
 
 def switch_off(area: Cube, volumes: list[Shape]) -> list[Shape]:
@@ -116,6 +118,10 @@ def switch_on(area: Cube, volumes: list[Shape]) -> list[Shape]:
     return pruned
 
 
+# the initialization region of -50..50 on every axis
+CORE = Cube((-50, 51), (-50, 51), (-50, 51))
+
+
 def reboot_core(instructions: INSTRUCTIONS) -> int:
     volumes = []
     for on, area in instructions:
@@ -137,3 +143,124 @@ def reboot_all(instructions: INSTRUCTIONS) -> int:
             volumes = switch_off(area, volumes)
     return sum(volume.volume for volume in volumes)
 
+
+# Spatial index
+# =============
+# Both `switch_on` and `switch_off` touch every Shape for every instruction, even
+# though most instructions only overlap a few others.
+# Instead, we keep the lit region as *disjoint* cuboids in a hierarchical grid of
+# buckets. Each level of the grid has twice the cell size of the previous one, and
+# each cuboid goes to the first level whose cells are at least as large as its longest
+# edge. That way, a cuboid overlaps at most two cells per axis – no matter how large
+# it is – and is registered in at most 8 buckets.
+# The candidates for intersecting an instruction are just the cuboids in the buckets
+# the instruction overlaps. For large instructions it is cheaper to check each
+# non-empty bucket of a level than to look up all the cells it overlaps, so the
+# cost of a lookup is bounded by the number of cuboids, not by their volume.
+# Each intersecting cuboid is replaced by its difference to the instruction, and for
+# "on" instructions the instruction itself is added.
+# Since the cuboids are disjoint, the lit volume is just the sum of their volumes; we
+# keep it up to date by adding and subtracting the volume of each change.
+CELL = tuple[int, int, int]
+
+
+class CuboidGrid:
+    """Hierarchical grid of buckets of cuboids"""
+
+    def __init__(self, cell: int):
+        self.cell = cell
+        self.levels: dict[int, dict[CELL, set[Cube]]] = {}
+
+    def _level(self, cube: Cube) -> int:
+        edge = max(high - low for low, high in cube)
+        return ((edge - 1) // self.cell).bit_length()
+
+    def _ranges(self, level: int, cube: Cube) -> list[range]:
+        cell = self.cell << level
+        return [range(low // cell, (high - 1) // cell + 1) for low, high in cube]
+
+    def add(self, cube: Cube):
+        level = self._level(cube)
+        buckets = self.levels.setdefault(level, {})
+        for key in product(*self._ranges(level, cube)):
+            buckets.setdefault(key, set()).add(cube)
+
+    def remove(self, cube: Cube):
+        level = self._level(cube)
+        buckets = self.levels[level]
+        for key in product(*self._ranges(level, cube)):
+            bucket = buckets[key]
+            bucket.discard(cube)
+            if not bucket:
+                del buckets[key]
+        if not buckets:
+            del self.levels[level]
+
+    def intersecting(self, area: Cube) -> set[Cube]:
+        """All cuboids that intersect with `area`"""
+        candidates = set()
+        for level, buckets in self.levels.items():
+            ranges = self._ranges(level, area)
+            if prod(map(len, ranges)) <= len(buckets):
+                for key in product(*ranges):
+                    candidates.update(buckets.get(key, ()))
+            else:
+                for key, bucket in buckets.items():
+                    if all(index in indices for index, indices in zip(key, ranges)):
+                        candidates.update(bucket)
+        return {cube for cube in candidates if cube.intersects(area)}
+
+    def containing(self, point: tuple[int, int, int]) -> Optional[Cube]:
+        """The cuboid that contains `point`, if any"""
+        for level, buckets in self.levels.items():
+            cell = self.cell << level
+            for cube in buckets.get(tuple(coord // cell for coord in point), ()):
+                if all(low <= coord < high for coord, (low, high) in zip(point, cube)):
+                    return cube
+        return None
+
+
+class Reactor:
+    """Reactor core as a set of disjoint, indexed lit cuboids"""
+
+    def __init__(self, cell: int):
+        self.grid = CuboidGrid(cell)
+        self.volume = 0
+
+    def switch(self, on: bool, area: Cube):
+        """Switch all cubes in `area` on or off"""
+        for cube in self.grid.intersecting(area):
+            self.grid.remove(cube)
+            self.volume -= cube.volume
+            for fragment in cube.difference(area):
+                self.grid.add(fragment)
+                self.volume += fragment.volume
+        if on:
+            self.grid.add(area)
+            self.volume += area.volume
+
+    # Since the reactor state is a set of disjoint cuboids, we can ask it about any
+    # region without replaying the instructions: a point is lit if it is in one of the
+    # cuboids of its grid cells, and the lit volume of a box is the sum of the volumes
+    # by which it intersects the cuboids.
+    def __contains__(self, point: tuple[int, int, int]) -> bool:
+        return self.grid.containing(point) is not None
+
+    def volume_in(self, area: Cube) -> int:
+        """The lit volume inside of `area`"""
+        return sum(
+            cube.intersection(area).volume for cube in self.grid.intersecting(area)
+        )
+
+
+def reboot_indexed(instructions: INSTRUCTIONS, cell: Optional[int] = None) -> Reactor:
+    # the typical size of instructions is a good guess for the size of cuboids
+    if cell is None:
+        cell = max(
+            1,
+            int(median(high - low for _, area in instructions for low, high in area)),
+        )
+    reactor = Reactor(cell)
+    for on, area in instructions:
+        reactor.switch(on, area)
+    return reactor